@@ -1,28 +1,41 @@
-from .io import roi_to_file, file_to_roi
-from .clouds import custom_mask_clouds, get_clear_sky_percentage
-from .catalog import list_sat_images
-from .analysis import index_to_timeseries, get_TerraClimate, get_CHIRPS, describe_roi, extract_mapbiomas
-from .sidra_tools import get_sidra_cultura
+import importlib
 
-__all__ = [
+# Os submódulos (e suas dependências pesadas: ee, eemont, geopandas...) só são
+# importados no primeiro acesso a uma de suas funções (PEP 562)
+_lazy = {
     # io
-    'roi_to_file',
-    'file_to_roi',
+    'roi_to_file': '.io',
+    'file_to_roi': '.io',
 
     # clouds
-    'custom_mask_clouds',
-    'get_clear_sky_percentage',
+    'custom_mask_clouds': '.clouds',
+    'get_clear_sky_percentage': '.clouds',
 
     # catalog
-    'list_sat_images',
+    'list_sat_images': '.catalog',
 
     # analysis
-    'index_to_timeseries',
-    'get_TerraClimate',
-    'get_CHIRPS',
-    'describe_roi',
-    'extract_mapbiomas',
+    'index_to_timeseries': '.analysis',
+    'get_TerraClimate': '.analysis',
+    'get_CHIRPS': '.analysis',
+    'describe_roi': '.analysis',
+    'extract_mapbiomas': '.analysis',
 
     # sidra
-    'get_sidra_cultura',
-]
+    'get_sidra_cultura': '.sidra_tools',
+    'get_sidra_cultura_batch': '.sidra_tools',
+}
+
+# Fonte única da API pública: a lista abaixo não pode divergir de _lazy
+__all__ = list(_lazy)
+
+def __getattr__(name):
+    if name not in _lazy:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_lazy[name], __name__), name)
+    globals()[name] = value  # próximos acessos não passam mais por aqui
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -3,6 +3,7 @@ import ee
 import geemap
 import eemont
 import geopandas as gpd
+import numpy as np
 import pandas as pd
 from tqdm import tqdm
 import os
@@ -11,82 +12,375 @@ from pathlib import Path
 from zipfile import ZipFile
 import tempfile
 from tempfile import TemporaryDirectory
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from itertools import chain
+import hashlib
+import json
+
+# Escala (m) por prefixo do ID da imagem, resolvida no cliente sem chamada ao servidor
+_SCALE_BY_PREFIX = {
+    'LANDSAT/': 30,
+    'COPERNICUS/S2': 20,
+}
+
+
+def _infer_scale(img_id):
+    """
+    Escala pelo prefixo do ID, ou None se o prefixo não for conhecido
+    (nesse caso a escala é decidida no servidor por _auto_scale).
+    """
+    return next((s for prefix, s in _SCALE_BY_PREFIX.items() if img_id.startswith(prefix)), None)
+
+
+def _auto_scale(img):
+    """
+    Escala (m) escolhida no servidor a partir das bandas da imagem,
+    sem nenhuma chamada getInfo() no cliente.
+    """
+    bands = img.bandNames()
+    return ee.Number(ee.Algorithms.If(
+        bands.contains('QA_PIXEL'), 30,  # Landsat
+        ee.Algorithms.If(bands.contains('SCL'), 20, 10)  # Sentinel-2 / outros
+    ))
+
+
+@lru_cache(maxsize=None)
+def _mean_std_reducer():
+    """
+    Redutor combinado média + desvio padrão, construído uma única vez.
+    A construção é adiada até o primeiro uso porque exige o Earth Engine inicializado.
+    """
+    return ee.Reducer.mean().combine(ee.Reducer.stdDev(), sharedInputs=True)
+
+
+@lru_cache(maxsize=None)
+def _full_stats_reducer():
+    """
+    Redutor combinado média + mediana + mín/máx + desvio padrão, construído uma única vez
+    e reutilizado por todas as imagens mapeadas.
+    """
+    return (ee.Reducer.mean()
+            .combine(ee.Reducer.median(), sharedInputs=True)
+            .combine(ee.Reducer.minMax(), sharedInputs=True)
+            .combine(ee.Reducer.stdDev(), sharedInputs=True))
 
 
-def index_to_timeseries(df, roi, index_name, scale=None, debug=False):
+def _fc_to_df(fc):
+    """
+    Converte uma FeatureCollection em DataFrame pelo endpoint de tabelas
+    (ee.data.computeFeatures), que pagina os resultados sem o limite de 5000
+    feições do getInfo(). A coluna de geometria ('geo') é descartada.
+    """
+    df = ee.data.computeFeatures({
+        'expression': ee.FeatureCollection(fc),
+        'fileFormat': 'PANDAS_DATAFRAME'
+    })
+    return df.drop(columns='geo', errors='ignore')
+
+
+def _in_notebook():
+    """
+    True se estiver rodando num kernel IPython/Jupyter (onde display() está disponível).
+    """
+    try:
+        from IPython import get_ipython
+        shell = get_ipython()
+        return shell is not None and 'IPKernelApp' in shell.config
+    except Exception:
+        return False
+
+
+def _tile_grid(roi, tile_size):
+    """
+    Divide o retângulo envolvente da ROI numa grade regular de ladrilhos
+    (em graus), recortados pela ROI, retornando um ee.FeatureCollection.
+    """
+    coords = roi.bounds().coordinates().getInfo()[0]
+    xs = [c[0] for c in coords]
+    ys = [c[1] for c in coords]
+    xmin, xmax, ymin, ymax = min(xs), max(xs), min(ys), max(ys)
+
+    error_margin = ee.ErrorMargin(1)
+    tiles = []
+    y0 = ymin
+    while y0 < ymax:
+        x0 = xmin
+        y1 = min(y0 + tile_size, ymax)
+        while x0 < xmax:
+            x1 = min(x0 + tile_size, xmax)
+            rect = ee.Geometry.Rectangle([x0, y0, x1, y1])
+            tiles.append(ee.Feature(rect.intersection(roi, error_margin)))
+            x0 = x1
+        y0 = y1
+
+    return ee.FeatureCollection(tiles)
+
+
+def index_to_timeseries(df, roi, index_name, scale=None, debug=False, n_workers=8, batch_size=100,
+                        tile_size=None, stack=False, cache_dir=None, bands=None,
+                        return_only_new_cols=False, best_effort=True):
     """
     Calcula o valor médio e o desvio padrão de um índice espectral do eemont
     sobre uma ROI, para cada imagem listada em um DataFrame.
+    As reduções são feitas no servidor, com uma requisição por lote de imagens,
+    e os lotes são enviados em paralelo.
 
     Args:
         df (pd.DataFrame): DataFrame com coluna 'id' contendo IDs de imagens.
-        roi (ee.Geometry): Região de interesse.
-        index_name (str): Nome do índice (ex: 'NDWI', 'NDMI', 'MNDWI', etc.).
+        roi (ee.Geometry | ee.Feature | ee.FeatureCollection): Região de interesse.
+        index_name (str | list): Nome do índice (ex: 'NDWI', 'NDMI', 'MNDWI', etc.)
+            ou lista de índices, calculados juntos numa única passagem por imagem.
         scale (int, optional): Escala em metros (detectada automaticamente se None).
         debug (bool): Se True, imprime mensagens de debug.
+        n_workers (int): Número de requisições simultâneas ao Earth Engine (padrão: 8).
+        batch_size (int): Número de imagens reduzidas por requisição (padrão: 100).
+        tile_size (float, optional): Se definido, divide a ROI em ladrilhos com esse
+            tamanho (em graus), reduz cada ladrilho separadamente e agrega os resultados.
+            Útil para ROIs muito grandes, que excedem os limites de uma única redução.
+        stack (bool): Se True, empilha as imagens de cada lote numa única imagem
+            multibanda e faz um só reduceRegion por lote, em vez de um por imagem.
+            A escala é a mesma para todo o lote. Não pode ser usado com tile_size.
+        cache_dir (str, optional): Diretório de cache em disco. Se definido, resultados
+            já calculados para a mesma ROI, índice e escala são reaproveitados entre
+            execuções e apenas as imagens novas são enviadas ao Earth Engine.
+        bands (list, optional): Bandas já presentes nas imagens. Índices incluídos nesta
+            lista são lidos diretamente da imagem, sem recalcular com spectralIndices.
+        return_only_new_cols (bool): Se True, retorna apenas as colunas novas, com o
+            mesmo índice de df, sem copiar as demais colunas. df.join(resultado)
+            produz o mesmo que o retorno padrão.
+        best_effort (bool): Se True (padrão), o Earth Engine pode usar uma escala mais
+            grossa quando a ROI tem pixels demais, em vez de falhar.
 
     Returns:
-        pd.DataFrame: Mesmo DataFrame com colunas <index_name>_mean e _std.
+        pd.DataFrame: Novo DataFrame com as colunas de df e as colunas <índice>_mean e _std
+            para cada índice (ou só essas colunas, se return_only_new_cols=True).
+            O DataFrame de entrada não é modificado.
 
     ------------------------------------------------------------------------
 
     Computes the mean and standard deviation of a spectral index (from eemont)
     over a given ROI for each image listed in a DataFrame.
+    Reductions run server-side, with one request per batch of images,
+    and batches are sent in parallel.
 
     Args:
         df (pd.DataFrame): DataFrame with a column 'id' containing image IDs.
-        roi (ee.Geometry): Region of interest.
-        index_name (str): Name of the spectral index (e.g., 'NDWI', 'NDMI', 'MNDWI', etc.).
+        roi (ee.Geometry | ee.Feature | ee.FeatureCollection): Region of interest.
+        index_name (str | list): Name of the spectral index (e.g., 'NDWI', 'NDMI', 'MNDWI', etc.)
+            or a list of indices, computed together in a single pass per image.
         scale (int, optional): Export scale in meters (automatically detected if None).
         debug (bool): If True, prints debug messages.
+        n_workers (int): Number of concurrent requests to Earth Engine (default: 8).
+        batch_size (int): Number of images reduced per request (default: 100).
+        tile_size (float, optional): If set, splits the ROI into tiles of this size
+            (in degrees), reduces each tile separately and aggregates the results.
+            Useful for very large ROIs that exceed the limits of a single reduction.
+        stack (bool): If True, stacks the images of each batch into a single
+            multi-band image and runs one reduceRegion per batch instead of one per image.
+            The scale is shared by the whole batch. Cannot be combined with tile_size.
+        cache_dir (str, optional): On-disk cache directory. If set, results already
+            computed for the same ROI, index and scale are reused across runs and only
+            new images are sent to Earth Engine.
+        bands (list, optional): Bands already present in the images. Indices in this
+            list are read directly from the image instead of being recomputed with
+            spectralIndices.
+        return_only_new_cols (bool): If True, returns only the new columns, with the
+            same index as df, without copying the other columns. df.join(result)
+            yields the same as the default return value.
+        best_effort (bool): If True (default), Earth Engine may use a coarser scale
+            when the ROI has too many pixels, instead of failing.
 
     Returns:
-        pd.DataFrame: The same DataFrame with additional columns <index_name>_mean and _std.
+        pd.DataFrame: New DataFrame with the columns of df plus <index>_mean and _std
+            for each index (or only those columns, if return_only_new_cols=True).
+            The input DataFrame is not modified.
     """
-    index_means = []
-    index_stds = []
+    if stack and tile_size is not None:
+        raise ValueError("Os modos stack e tile_size não podem ser usados juntos.")
 
-    for img_id in tqdm(df['id'], desc=f"Calculando {index_name} na ROI"):
-        try:
-            img = ee.Image(img_id)
-            img = img.spectralIndices(index_name)
-
-            # Detecta escala baseada no sensor (se necessário)
-            if scale is None:
-                bands = img.bandNames().getInfo()
-                if 'QA_PIXEL' in bands:
-                    used_scale = 30  # Landsat
-                elif 'SCL' in bands:
-                    used_scale = 20  # Sentinel-2
-                else:
-                    used_scale = 10
-                if debug:
-                    print(f"[DEBUG] Escala auto-definida para {img_id}: {used_scale}")
-            else:
-                used_scale = scale
-
-            # Redução do índice sobre a ROI
-            stats = img.select(index_name).reduceRegion(
-                reducer=ee.Reducer.mean().combine(ee.Reducer.stdDev(), sharedInputs=True),
+    index_names = [index_name] if isinstance(index_name, str) else list(index_name)
+    columns = [f"{name}_{stat}" for name in index_names for stat in ('mean', 'std')]
+
+    # IDs repetidos são calculados uma única vez e mapeados de volta ao final
+    ids = df['id'].drop_duplicates().tolist()
+
+    # Resolve a ROI uma única vez numa geometria constante, para que cada lote
+    # não reenvie (e o servidor não recalcule) a expressão que a gerou
+    if isinstance(roi, (ee.Feature, ee.FeatureCollection)):
+        roi = roi.geometry()
+    if roi.func is not None:
+        roi = ee.Geometry(roi.getInfo())
+
+    tiles = _tile_grid(roi, tile_size) if tile_size is not None else None
+
+    # Cache em disco, com uma chave estável para (índices, ROI, escala, modo de redução)
+    cache_path, cached = None, {}
+    if cache_dir is not None:
+        key = json.dumps([index_names, roi.toGeoJSONString(), scale, tile_size, stack, best_effort])
+        digest = hashlib.blake2b(key.encode(), digest_size=8).hexdigest()
+        cache_path = Path(cache_dir) / f"{'_'.join(index_names)}_{digest}.json"
+        if cache_path.exists():
+            cached = json.loads(cache_path.read_text())
+        if debug:
+            print(f"[DEBUG] Cache {cache_path}: {len(cached)} resultados reaproveitados")
+
+    # Agrupa as imagens por coleção: o eemont identifica a plataforma pela primeira imagem
+    groups = {}
+    for img_id in ids:
+        if img_id in cached:
+            continue
+        groups.setdefault(img_id.rsplit('/', 1)[0], []).append(img_id)
+
+    # Índices que precisam ser calculados (os demais já existem nas imagens)
+    to_compute = [name for name in index_names if bands is None or name not in bands]
+
+    # Uma coleção por grupo, montada no servidor a partir da lista de IDs. O eemont
+    # identifica a plataforma pelo system:id da coleção (uma chamada getInfo()), então
+    # os índices são aplicados uma vez por coleção, e não uma vez por lote
+    group_collections = {}
+    for prefix, group_ids in groups.items():
+        collection = ee.ImageCollection.fromImages(ee.List(group_ids).map(lambda img_id: ee.Image.load(img_id)))
+        collection = collection.set('system:id', prefix)
+        if to_compute:
+            collection = collection.spectralIndices(to_compute)
+        group_collections[prefix] = collection
+
+    # Monta os lotes (coleção, posição inicial, IDs) a serem processados em paralelo
+    batches = [
+        (prefix, i, group_ids[i:i + batch_size])
+        for prefix, group_ids in groups.items()
+        for i in range(0, len(group_ids), batch_size)
+    ]
+
+    if debug:
+        print(f"[DEBUG] {len(ids)} imagens divididas em {len(batches)} lotes")
+
+    # Valores padrão garantem todas as chaves mesmo quando a redução não retorna pixels
+    defaults = ee.Dictionary({
+        f"{name}_{stat}": None for name in index_names for stat in ('mean', 'stdDev')
+    })
+
+    def _one_batch(batch):
+        # Fatia do lote na coleção do grupo, já com os índices calculados
+        prefix, offset, batch_ids = batch
+        collection = ee.ImageCollection(group_collections[prefix].toList(len(batch_ids), offset))
+
+        # Todas as imagens do lote são da mesma coleção, então o prefixo do primeiro ID basta
+        batch_scale = scale if scale is not None else _infer_scale(batch_ids[0])
+
+        # Redução dos índices sobre a ROI, feita no servidor para todas as imagens
+        def _stats(img):
+            # Escala baseada no sensor, decidida no servidor só se o prefixo for desconhecido
+            used_scale = batch_scale if batch_scale is not None else _auto_scale(img)
+            stats = img.select(index_names).reduceRegion(
+                reducer=_mean_std_reducer(),
                 geometry=roi,
                 scale=used_scale,
-                maxPixels=1e9
+                maxPixels=1e13,
+                bestEffort=best_effort,
+                tileScale=4
+            )
+            stats = defaults.combine(stats)
+            props = {}
+            for name in index_names:
+                props[f"{name}_mean"] = stats.get(f"{name}_mean")
+                props[f"{name}_std"] = stats.get(f"{name}_stdDev")
+            return ee.Feature(None, props)
+
+        # Redução por ladrilho: soma, soma dos quadrados e contagem de pixels em cada
+        # ladrilho, agregadas no servidor em média e desvio padrão da ROI inteira
+        def _tiled_stats(img):
+            used_scale = batch_scale if batch_scale is not None else _auto_scale(img)
+            selected = img.select(index_names)
+            squares = selected.pow(2).rename([f"{name}_sq" for name in index_names])
+            per_tile = selected.addBands(squares).reduceRegions(
+                collection=tiles,
+                reducer=ee.Reducer.sum().combine(ee.Reducer.count(), sharedInputs=True),
+                scale=used_scale,
+                tileScale=4
+            )
+            props = {}
+            for name in index_names:
+                total = ee.Number(per_tile.aggregate_sum(f"{name}_sum"))
+                total_sq = ee.Number(per_tile.aggregate_sum(f"{name}_sq_sum"))
+                count = ee.Number(per_tile.aggregate_sum(f"{name}_count"))
+                mean = total.divide(count)
+                std = total_sq.divide(count).subtract(mean.pow(2)).max(0).sqrt()
+                has_pixels = count.gt(0)
+                props[f"{name}_mean"] = ee.Algorithms.If(has_pixels, mean, None)
+                props[f"{name}_std"] = ee.Algorithms.If(has_pixels, std, None)
+            return ee.Feature(None, props)
+
+        # Empilha o lote numa imagem multibanda (bandas de cada imagem, na ordem do lote)
+        # e reduz todas as bandas de uma vez
+        if stack:
+            band_names = [[f"b{i}_{name}" for name in index_names] for i in range(len(batch_ids))]
+            stacked = collection.select(index_names).toBands().rename(list(chain(*band_names)))
+            stats = stacked.reduceRegion(
+                reducer=_mean_std_reducer(),
+                geometry=roi,
+                scale=batch_scale if batch_scale is not None else _auto_scale(collection.first()),
+                maxPixels=1e13,
+                bestEffort=best_effort,
+                tileScale=4
             ).getInfo()
+            return [
+                (img_id, *chain.from_iterable(
+                    (stats.get(f"{band}_mean"), stats.get(f"{band}_stdDev")) for band in img_bands
+                ))
+                for img_id, img_bands in zip(batch_ids, band_names)
+            ]
+
+        mapper = _tiled_stats if tile_size is not None else _stats
+        fc = ee.FeatureCollection(collection.map(mapper))
+
+        # Uma única consulta de tabela para todo o lote; a ordem é preservada pelo map()
+        table = _fc_to_df(fc).reindex(columns=columns)
+        return [(img_id, *values) for img_id, values in zip(batch_ids, table.itertuples(index=False))]
+
+    # As requisições são limitadas pela rede, então os lotes podem rodar em threads;
+    # os resultados são consumidos à medida que chegam, sem lista intermediária
+    def _records():
+        # Não abre mais threads do que lotes (e ao menos uma, mesmo com tudo em cache)
+        with ThreadPoolExecutor(max_workers=max(1, min(n_workers, len(batches)))) as executor:
+            batch_results = executor.map(_one_batch, batches)
+            progress = tqdm(
+                batch_results,
+                total=len(batches),
+                desc=f"Calculando {', '.join(index_names)} na ROI",
+                disable=len(ids) < 50  # listas curtas terminam rápido; a barra só adiciona ruído
+            )
+            for batch_rows in progress:
+                yield from batch_rows
+
+    # Os resultados são gravados direto numa matriz float64 pré-alocada (None -> NaN),
+    # sem listas intermediárias de objetos Python
+    position = {img_id: i for i, img_id in enumerate(ids)}
+    values = np.full((len(ids), len(columns)), np.nan, dtype=np.float64)
+    cached_records = ((img_id, *cached[img_id]) for img_id in ids if img_id in cached)
+    for img_id, *row in chain(cached_records, _records()):
+        values[position[img_id]] = row
+
+    # Tabela indexada por ID, depois juntada ao DataFrame original
+    out = pd.DataFrame(values, index=pd.Index(ids, name='id'), columns=columns)
+
+    if cache_path is not None:
+        cached.update({
+            img_id: [None if pd.isna(v) else v for v in values]
+            for img_id, *values in out.itertuples()
+        })
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        cache_path.write_text(json.dumps(cached))
 
-            index_means.append(stats.get(f"{index_name}_mean"))
-            index_stds.append(stats.get(f"{index_name}_stdDev"))
-
-        except Exception as e:
-            if debug:
-                print(f"[DEBUG] Falha ao calcular {index_name} para {img_id}: {e}")
-            index_means.append(None)
-            index_stds.append(None)
-
-    df = df.copy()
-    df[f"{index_name}_mean"] = index_means
-    df[f"{index_name}_std"] = index_stds
+    # As colunas novas formam um único bloco float64, na ordem das linhas de df
+    new = pd.DataFrame(out.reindex(df['id']).to_numpy(), index=df.index, columns=columns)
+    if return_only_new_cols:
+        return new
 
-    return df
+    # Um único concat em vez de inserir coluna por coluna; colunas com o mesmo nome
+    # (de uma execução anterior) são substituídas
+    return pd.concat([df.drop(columns=columns, errors='ignore'), new], axis=1)
 
 def describe_roi(roi, show_pixels_table=True, print_summary=True, pixel_res=None):
     """
@@ -128,8 +422,6 @@ def describe_roi(roi, show_pixels_table=True, print_summary=True, pixel_res=None
             "df": DataFrame with the table (if show_pixels_table=True)
         }
     """
-    import pandas as pd
-
     # Unifica em uma única geometria se necessário
     if isinstance(roi, ee.FeatureCollection):
         geom = roi.geometry()
@@ -140,18 +432,7 @@ def describe_roi(roi, show_pixels_table=True, print_summary=True, pixel_res=None
     else:
         raise TypeError("Tipo inválido. Use ee.Geometry, ee.Feature ou ee.FeatureCollection.")
 
-    # Cálculo da área e perímetro
-    area_m2 = geom.area(ee.ErrorMargin(1)).getInfo()
-    perimeter_m = geom.perimeter(maxError=1).getInfo()
-
-    area_km2 = area_m2 / 1e6
-    perimeter_km = perimeter_m / 1000
-
-    if print_summary:
-        print(f"📐 Área total: {area_km2:,.2f} km²")
-        print(f"📏 Perímetro total: {perimeter_km:,.2f} km")
-
-    # Resoluções padrão ou personalizadas
+    # Resoluções padrão ou personalizadas (validadas antes de qualquer chamada ao servidor)
     if pixel_res is None:
         resolutions = [10, 30, 60]
     elif isinstance(pixel_res, (int, float)):
@@ -161,29 +442,106 @@ def describe_roi(roi, show_pixels_table=True, print_summary=True, pixel_res=None
     else:
         raise ValueError("pixel_res deve ser int, float ou lista de valores numéricos.")
 
-    # Estima número de pixels por resolução
-    pixels_dict = {
-        f"{int(res)}m": int(round(area_m2 / (res**2)))
-        for res in resolutions
-    }
+    # Cálculo da área e perímetro numa única chamada ao servidor
+    info = ee.Dictionary({
+        'area': geom.area(ee.ErrorMargin(1)),
+        'perimeter': geom.perimeter(maxError=1)
+    }).getInfo()
+    area_m2 = info['area']
+    perimeter_m = info['perimeter']
+
+    area_km2 = area_m2 / 1e6
+    perimeter_km = perimeter_m / 1000
 
+    if print_summary:
+        print(f"📐 Área total: {area_km2:,.2f} km²")
+        print(f"📏 Perímetro total: {perimeter_km:,.2f} km")
+
+    # Estima número de pixels por resolução (todas as resoluções de uma vez)
+    res_arr = np.asarray(resolutions, dtype=np.float64)
+    pixel_area = res_arr * res_arr
+    n_pix = np.rint(area_m2 / pixel_area).astype(np.int64)
+    pixels_dict = dict(zip([f"{int(res)}m" for res in resolutions], n_pix.tolist()))
+
+    # A tabela só é montada quando pedida
     df = None
     if show_pixels_table:
         df = pd.DataFrame({
             "Resolução (m)": resolutions,
-            "Área de pixel (m²)": [res**2 for res in resolutions],
-            "Nº estimado de pixels": list(pixels_dict.values())
+            "Área de pixel (m²)": pixel_area,
+            "Nº estimado de pixels": n_pix
         })
-        display(df)
+        if _in_notebook():
+            from IPython.display import display
+            display(df)
+        else:
+            print(df.to_string(index=False))
 
     return {
         "area_km2": area_km2,
         "perimetro_km": perimeter_km,
         "n_pixels": pixels_dict,
-        "df": df if show_pixels_table else None
+        "df": df
     }
 
 
+# ----- Variáveis disponíveis no TerraClimate -----
+_TERRACLIMATE_VARS = frozenset({
+    'aet',  # Actual evapotranspiration
+    'def',  # Climate water deficit
+    'pdsi', # Palmer Drought Severity Index
+    'pet',  # Reference evapotranspiration
+    'pr',   # Precipitation
+    'ro',   # Runoff
+    'soil', # Soil moisture
+    'srad', # Downward surface shortwave radiation
+    'swe',  # Snow water equivalent
+    'tmmx', # Maximum temperature
+    'tmmn', # Minimum temperature
+    'vap',  # Vapor pressure
+    'vpd',  # Vapor pressure deficit
+    'vs'    # Wind-speed at 10 m
+})
+
+_TERRACLIMATE_STATS = ('mean', 'median', 'min', 'max', 'stdDev')
+
+# Fatores de escala (Data Catalog: coluna "Scale")
+# Valor_final = valor_bruto * _TERRACLIMATE_SCALE[var]
+_TERRACLIMATE_SCALE = {
+    'aet': 0.1,
+    'def': 0.1,
+    'pdsi': 0.01,
+    'pet': 0.1,
+    'pr': 0.1,
+    'ro': 0.1,
+    'soil': 0.1,
+    'srad': 0.1,
+    'swe': 0.1,
+    'tmmx': 0.1,
+    'tmmn': 0.1,
+    'vap': 0.001,
+    'vpd': 0.01,
+    'vs': 0.01,
+}
+
+_TERRACLIMATE_UNITS = {
+    "aet": "mm",
+    "def": "mm",
+    "pdsi": "índice (adimensional)",
+    "pet": "mm",
+    "pr": "mm",
+    "ro": "mm",
+    "soil": "mm",
+    "srad": "W/m^2",
+    "swe": "mm",
+    "tmmx": "°C",
+    "tmmn": "°C",
+    "vap": "kPa",
+    "vpd": "kPa",
+    "vs": "m/s"
+}
+
+
 def get_TerraClimate(
     roi,
     start="2000-01-01",
@@ -219,62 +577,24 @@ def get_TerraClimate(
                       <variável>_<stat>, ex: pr_mean, tmmx_min, vs_stdDev.
     """
 
-    # ----- Variáveis disponíveis no TerraClimate -----
-    valid_vars = [
-        'aet',  # Actual evapotranspiration
-        'def',  # Climate water deficit
-        'pdsi', # Palmer Drought Severity Index
-        'pet',  # Reference evapotranspiration
-        'pr',   # Precipitation
-        'ro',   # Runoff
-        'soil', # Soil moisture
-        'srad', # Downward surface shortwave radiation
-        'swe',  # Snow water equivalent
-        'tmmx', # Maximum temperature
-        'tmmn', # Minimum temperature
-        'vap',  # Vapor pressure
-        'vpd',  # Vapor pressure deficit
-        'vs'    # Wind-speed at 10 m
-    ]
-
-    # Fatores de escala (Data Catalog: coluna "Scale")
-    # Valor_final = valor_bruto * scale_factor[var]
-    scale_factor = {
-        'aet': 0.1,
-        'def': 0.1,
-        'pdsi': 0.01,
-        'pet': 0.1,
-        'pr': 0.1,
-        'ro': 0.1,
-        'soil': 0.1,
-        'srad': 0.1,
-        'swe': 0.1,
-        'tmmx': 0.1,
-        'tmmn': 0.1,
-        'vap': 0.001,
-        'vpd': 0.01,
-        'vs': 0.01,
-    }
-
     # Defaults de variáveis e estatísticas
     if variables is None:
         variables = ['pr', 'pet', 'srad', 'tmmx', 'tmmn']
 
-    valid_stats = ['mean', 'median', 'min', 'max', 'stdDev']
     if stats is None:
-        stats = valid_stats.copy()
+        stats = list(_TERRACLIMATE_STATS)
 
     # Validação de variáveis e stats
-    vars_selected = [v for v in variables if v in valid_vars]
+    vars_selected = [v for v in variables if v in _TERRACLIMATE_VARS]
     if len(vars_selected) == 0:
         raise ValueError(
-            f"Nenhuma variável válida selecionada. Use alguma das seguintes: {valid_vars}"
+            f"Nenhuma variável válida selecionada. Use alguma das seguintes: {sorted(_TERRACLIMATE_VARS)}"
         )
 
-    stats_selected = [s for s in stats if s in valid_stats]
+    stats_selected = [s for s in stats if s in _TERRACLIMATE_STATS]
     if len(stats_selected) == 0:
         raise ValueError(
-            f"Nenhuma estatística válida selecionada. Use alguma das seguintes: {valid_stats}"
+            f"Nenhuma estatística válida selecionada. Use alguma das seguintes: {list(_TERRACLIMATE_STATS)}"
         )
 
     # ----- Carrega coleção filtrada por ROI e datas -----
@@ -289,13 +609,11 @@ def get_TerraClimate(
     if n_img == 0:
         raise ValueError("Nenhuma imagem TerraClimate disponível para esse período/ROI.")
 
-    # ----- Monta o redutor (sempre completo) -----
-    reducer = (
-        ee.Reducer.mean()
-        .combine(ee.Reducer.median(), sharedInputs=True)
-        .combine(ee.Reducer.minMax(), sharedInputs=True)
-        .combine(ee.Reducer.stdDev(), sharedInputs=True)
-    )
+    # ----- Redutor (sempre completo), compartilhado com o CHIRPS -----
+    reducer = _full_stats_reducer()
+
+    # Chaves do dicionário do reduceRegion a manter em cada feição
+    keys = ee.List([f"{var}_{stat}" for var in vars_selected for stat in stats_selected])
 
     # ----- Função para extrair estatísticas por imagem (mensal) -----
     def stats_by_month(img):
@@ -306,77 +624,36 @@ def get_TerraClimate(
             maxPixels=maxPixels
         )
 
-        result = {'date': img.date().format("YYYY-MM")}
-
-        for var in vars_selected:
-
-            if 'mean' in stats_selected:
-                result[f"{var}_mean"] = stats_dict.get(f"{var}_mean")
-
-            if 'median' in stats_selected:
-                result[f"{var}_median"] = stats_dict.get(f"{var}_median")
-
-            if 'min' in stats_selected:
-                result[f"{var}_min"] = stats_dict.get(f"{var}_min")
-
-            if 'max' in stats_selected:
-                result[f"{var}_max"] = stats_dict.get(f"{var}_max")
-
-            if 'stdDev' in stats_selected:
-                result[f"{var}_stdDev"] = stats_dict.get(f"{var}_stdDev")
-
-        return ee.Feature(None, result)
+        # Seleciona todas as chaves <var>_<stat> de uma vez, no servidor
+        subset = stats_dict.select(keys, True)
+        return ee.Feature(None, subset.set('date', img.date().format("YYYY-MM")))
 
 
     # Aplica a função em toda a coleção mensal
     features = ee.FeatureCollection(terra.map(stats_by_month))
 
     # ----- Converte para DataFrame -----
-    df = geemap.ee_to_df(features)
+    df = _fc_to_df(features)
 
     # Converte coluna de data e ordena
+    # (a coleção já vem em ordem cronológica; só ordena se necessário)
     df['date'] = pd.to_datetime(df['date'])
-    df = df.sort_values('date').set_index('date')
-
-    # Trata None como NaN e tenta converter numéricos de forma segura
-    df = df.replace({None: pd.NA})
-    for col in df.columns:
-        # Converte valores numéricos; se não der, mantém o original
-        converted = pd.to_numeric(df[col], errors="coerce")
-        df[col] = converted.fillna(df[col])
+    df = df.set_index('date')
+    if not df.index.is_monotonic_increasing:
+        df = df.sort_index()
 
     # ----- Aplica fatores de escala do TerraClimate -----
-    for var in vars_selected:
-        sf = scale_factor.get(var, 1.0)
-        for stat in stats_selected:
-            if stat in ['mean', 'median', 'stdDev']:
-                col = f"{var}_{stat}"
-            elif stat in ['min', 'max']:
-                col = f"{var}_{stat}"
-            else:
-                continue
-
-            if col in df.columns and sf != 1.0:
-                df[col] = df[col] * sf
+    # Todas as colunas são estatísticas: um único bloco float64 (None -> NaN) multiplicado
+    # de uma vez pelo fator de cada coluna <var>_<stat>
+    factors = np.array([_TERRACLIMATE_SCALE.get(col.split('_')[0], 1.0) for col in df.columns])
+    df = pd.DataFrame(
+        df.to_numpy(dtype=np.float64, na_value=np.nan) * factors,
+        index=df.index,
+        columns=df.columns
+    )
 
     # ----- Atributos de unidades -----
-    units = {
-        "aet": "mm",
-        "def": "mm",
-        "pdsi": "índice (adimensional)",
-        "pet": "mm",
-        "pr": "mm",
-        "ro": "mm",
-        "soil": "mm",
-        "srad": "W/m^2",
-        "swe": "mm",
-        "tmmx": "°C",
-        "tmmn": "°C",
-        "vap": "kPa",
-        "vpd": "kPa",
-        "vs": "m/s"
-    }
-    df.attrs = {f"{v}_unit": units[v] for v in vars_selected}
+    df.attrs = {f"{v}_unit": _TERRACLIMATE_UNITS[v] for v in vars_selected}
 
     if debug:
         print(f"[DEBUG] Imagens na coleção: {n_img}")
@@ -573,13 +850,8 @@ def get_CHIRPS(roi, start="2000-01-01", end="2025-12-31", frequency="monthly", d
             warnings.warn(f"Atenção: {count} imagens diárias encontradas. Isso pode levar a uma execução demorada.")
 
         def extract_daily(img):
-            reducer = (ee.Reducer.mean()
-                       .combine(ee.Reducer.median(), sharedInputs=True)
-                       .combine(ee.Reducer.minMax(), sharedInputs=True)
-                       .combine(ee.Reducer.stdDev(), sharedInputs=True))
-
             stats = img.reduceRegion(
-                reducer=reducer,
+                reducer=_full_stats_reducer(),
                 geometry=roi,
                 scale=5000,
                 maxPixels=1e9
@@ -598,70 +870,54 @@ def get_CHIRPS(roi, start="2000-01-01", end="2025-12-31", frequency="monthly", d
 
     # === Modo mensal ===
     else:
-        years = list(range(int(start[:4]), int(end[:4]) + 1))
-        dfs = []
-
-        for year in tqdm(years, desc="Processando CHIRPS mensal"):
-            try:
-                year_chirps = chirps.filterDate(f"{year}-01-01", f"{year}-12-31")
-
-                def annotate_month(img):
-                    date = ee.Date(img.get("system:time_start"))
-                    return img.set({
-                        "year": date.get("year"),
-                        "month": date.get("month"),
-                        "year_month": date.format("YYYY-MM")
-                    })
-
-                year_chirps = year_chirps.map(annotate_month)
-                months = year_chirps.aggregate_array("year_month").distinct()
-
-                def reduce_month(month):
-                    month_imgs = year_chirps.filter(ee.Filter.eq("year_month", month))
-                    monthly_sum = month_imgs.sum().set("month", month)
-                    return monthly_sum
-
-                chirps_monthly_sum = ee.ImageCollection(months.map(reduce_month))
-
-                def stats_month(img):
-                    reducer = (ee.Reducer.mean()
-                               .combine(ee.Reducer.median(), sharedInputs=True)
-                               .combine(ee.Reducer.minMax(), sharedInputs=True)
-                               .combine(ee.Reducer.stdDev(), sharedInputs=True))
-
-                    stats = img.reduceRegion(
-                        reducer=reducer,
-                        geometry=roi,
-                        scale=5000,
-                        maxPixels=1e9
-                    )
-
-                    return ee.Feature(None, {
-                        'date': img.get("month"),
-                        'pr_mean': stats.get('precipitation_mean'),
-                        'pr_median': stats.get('precipitation_median'),
-                        'pr_max': stats.get('precipitation_max'),
-                        'pr_min': stats.get('precipitation_min'),
-                        'pr_stdDev': stats.get('precipitation_stdDev')
-                    })
-
-                features_year = chirps_monthly_sum.map(stats_month)
-                df_year = geemap.ee_to_df(ee.FeatureCollection(features_year))
-                dfs.append(df_year)
-
-            except Exception as e:
-                warnings.warn(f"[CHIRPS] Erro no ano {year}: {e}")
-
-        features = pd.concat(dfs, ignore_index=True)
+        # Cada imagem diária é anotada com seu ano-mês e agrupada por um único ee.Join
+        # (em vez de um filterDate sobre a coleção inteira para cada mês)
+        def annotate_month(img):
+            return img.set("year_month", img.date().format("YYYY-MM"))
+
+        chirps_annotated = chirps.map(annotate_month)
+
+        # Só os meses que têm imagens diárias entram na tabela
+        months = ee.FeatureCollection(
+            chirps_annotated.aggregate_array("year_month").distinct().map(
+                lambda month: ee.Feature(None, {"year_month": month})
+            )
+        )
+        month_join = ee.Join.saveAll("days").apply(
+            primary=months,
+            secondary=chirps_annotated,
+            condition=ee.Filter.equals(leftField="year_month", rightField="year_month")
+        )
+
+        # Soma mensal e estatísticas sobre a ROI, tudo num único pipeline no servidor
+        def stats_month(month):
+            monthly_sum = ee.ImageCollection.fromImages(month.get("days")).sum()
+            stats = monthly_sum.reduceRegion(
+                reducer=_full_stats_reducer(),
+                geometry=roi,
+                scale=5000,
+                maxPixels=1e9
+            )
+
+            return ee.Feature(None, {
+                'date': month.get("year_month"),
+                'pr_mean': stats.get('precipitation_mean'),
+                'pr_median': stats.get('precipitation_median'),
+                'pr_max': stats.get('precipitation_max'),
+                'pr_min': stats.get('precipitation_min'),
+                'pr_stdDev': stats.get('precipitation_stdDev')
+            })
+
+        features = ee.FeatureCollection(month_join.map(stats_month))
 
     # === Conversão final para DataFrame
-    if isinstance(features, pd.DataFrame):
-        df = features
-    else:
-        df = geemap.ee_to_df(features)
+    df = _fc_to_df(features)
 
+    # Só ordena se as datas não vierem em ordem cronológica
     df["date"] = pd.to_datetime(df["date"])
-    df = df.sort_values("date").set_index("date")
+    df = df.set_index("date")
+    if not df.index.is_monotonic_increasing:
+        df = df.sort_index()
 
     df.attrs = {
         "units": "mm",
@@ -686,16 +942,29 @@ import shutil
 from pathlib import Path
 from tqdm import tqdm
 from contextlib import redirect_stdout
-import io
 import rioxarray as rxr
+import rasterio
+from rasterio.enums import Resampling
+from rasterio.windows import Window
 import geopandas as gpd
 from geemap import ee_to_geojson
 from geemap_tools.io import roi_to_file
-import time
+
+_MAPBIOMAS_ASSET = "projects/mapbiomas-public/assets/brazil/lulc/collection9/mapbiomas_collection90_integration_v1"
+
+
+@lru_cache(maxsize=None)
+def _mapbiomas_bands(asset):
+    """
+    Nomes das bandas de um asset do MapBiomas, consultados uma única vez por sessão
+    (as bandas de uma coleção publicada não mudam).
+    """
+    return tuple(ee.Image(asset).bandNames().getInfo())
+
 
 def extract_mapbiomas(roi, years=range(1985, 2023), include_srtm=True,
                       include_terrain=False, terrain_vars=("hillshade",),
-                      comment=None, debug=False, scale=30):
+                      comment=None, debug=False, scale=30, n_workers=8, output_zarr=None):
     """
     Extrai dados da Coleção 9 do MapBiomas para um ROI, com opção de incluir elevação
     (SRTM) e variáveis derivadas do relevo (via ee.Terrain), exportando ano a ano e
@@ -718,11 +987,15 @@ def extract_mapbiomas(roi, years=range(1985, 2023), include_srtm=True,
         comment (str): Comentário opcional incluído nos metadados do dataset final.
         debug (bool): Se True, imprime mensagens informativas durante o processo.
         scale (int): Resolução espacial da exportação, em metros (padrão: 30 m).
+        n_workers (int): Número de downloads simultâneos (padrão: 8).
+        output_zarr (str | Path, opcional): Se definido, o dataset é gravado nesse
+            armazenamento Zarr (em blocos de 1 ano x 1024 x 1024 pixels) e retornado
+            com leitura sob demanda a partir do disco. Requer o pacote zarr.
 
     Returns:
         xr.Dataset: Conjunto de dados georreferenciados com dimensões (time, y, x),
-            contendo uma variável de uso da terra por ano e, se solicitado, camadas
-            adicionais de elevação e relevo.
+            contendo uma variável de uso da terra por ano (uint8, 0 = sem dado) e,
+            se solicitado, camadas adicionais de elevação e relevo.
 
     ------------------------------------------------------------------------
 
@@ -746,10 +1019,15 @@ def extract_mapbiomas(roi, years=range(1985, 2023), include_srtm=True,
         comment (str): Optional string to be saved as a metadata comment.
         debug (bool): If True, prints informative messages during processing.
         scale (int): Spatial resolution in meters (default: 30 m).
+        n_workers (int): Number of concurrent downloads (default: 8).
+        output_zarr (str | Path, optional): If set, the dataset is written to this
+            Zarr store (in chunks of 1 year x 1024 x 1024 pixels) and returned with
+            lazy, on-demand reads from disk. Requires the zarr package.
 
     Returns:
         xr.Dataset: Georeferenced dataset with dimensions (time, y, x),
-            containing land use per year and, if requested, elevation and terrain layers.
+            containing land use per year (uint8, 0 = no data) and, if requested,
+            elevation and terrain layers.
     """
     if isinstance(roi, ee.FeatureCollection) or isinstance(roi, ee.Feature):
         roi = roi.geometry()
@@ -758,111 +1036,150 @@ def extract_mapbiomas(roi, years=range(1985, 2023), include_srtm=True,
     if not bounds or "coordinates" not in bounds:
         raise ValueError("A geometria do ROI é inválida ou vazia.")
        
-    base_image = ee.Image("projects/mapbiomas-public/assets/brazil/lulc/collection9/mapbiomas_collection90_integration_v1")
+    base_image = ee.Image(_MAPBIOMAS_ASSET)
 
-    timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-    temp_dir = Path(f"temp_{timestamp}")
-    temp_dir.mkdir(exist_ok=True)
+    # Diretório temporário no disco local (LOCAL_SCRATCH, se definido), com nome único
+    temp_dir = Path(tempfile.mkdtemp(prefix="mapbiomas_", dir=os.environ.get("LOCAL_SCRATCH")))
 
     # === ROI to GeoJSON ===
     roi_geojson_path = temp_dir / "roi.geojson"
     roi_to_file(roi, roi_geojson_path, format="geojson")
     gdf = gpd.read_file(roi_geojson_path)
     
-    temp_paths = []
-    da_list = []
     if debug:
         tqdm.write("📦 Exportando bandas ano a ano:")
         
     # Verifica os anos disponíveis na imagem base
-    available_bands = base_image.bandNames().getInfo()
-    available_years = [
+    available_bands = _mapbiomas_bands(_MAPBIOMAS_ASSET)
+    available_years = {
         int(band.split("_")[1]) for band in available_bands if band.startswith("classification_")
-    ]
+    }
     valid_years = [year for year in years if year in available_years]
     
     # Aviso se houver anos inválidos
     invalid_years = set(years) - set(valid_years)
     if invalid_years:
         tqdm.write(f"⚠️ Aviso: Os seguintes anos não estão disponíveis e serão ignorados: {sorted(invalid_years)}")
-    
-    for year in tqdm(valid_years, desc="Exportando bandas ano a ano"):
-        band = f"classification_{year}"
-        band_name = f"mapbiomas_{year}"
-        mask = ee.Image.constant(1).clip(roi).selfMask()
-        image = base_image.select(band).rename(band_name).updateMask(mask)
-        temp_tif = temp_dir / f"{band_name}.tif"
-        temp_paths.append(temp_tif)
-
-        f = io.StringIO()
-        with redirect_stdout(f):
-            geemap.ee_export_image(
-                image,
-                filename=str(temp_tif),
-                region=roi,
-                scale=scale,
-                file_per_band=False
-            )
 
-        with rxr.open_rasterio(temp_tif, masked=True, cache=False) as da:
-            da = da.squeeze("band", drop=True)
-            da.name = "mapbiomas_class"
-            da = da.expand_dims(time=[np.datetime64(f"{year}-01-01")])
-            da = da.rio.clip(gdf.geometry, gdf.crs, drop=True)
-            da_list.append(da)
+    if not valid_years:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        raise ValueError(
+            f"Nenhum dos anos solicitados está disponível no MapBiomas. "
+            f"Anos disponíveis: {sorted(available_years)}"
+        )
+    
+    # Máscara da ROI construída uma única vez e reaproveitada em todos os anos
+    roi_mask = ee.Image.constant(1).clip(roi).selfMask()
 
-    stacked = xr.concat(da_list, dim="time")
-    ds = stacked.to_dataset(name="mapbiomas_class")
+    # Todas as exportações (anos, SRTM e relevo) são independentes: monta a lista de
+    # trabalhos (imagem, arquivo, região) e baixa tudo num único pool de threads
+    jobs = []
+    for year in valid_years:
+        band_name = f"mapbiomas_{year}"
+        # As classes do MapBiomas cabem em uint8 (0 = sem dado)
+        image = base_image.select(f"classification_{year}").rename(band_name).updateMask(roi_mask).toUint8()
+        jobs.append((image, temp_dir / f"{band_name}.tif", roi))
 
     if include_srtm:
         if debug:
             tqdm.write("🗻 Incluindo SRTM...")
-
         srtm = ee.Image("USGS/SRTMGL1_003").rename("srtm_elevation")
         temp_srtm = temp_dir / "srtm.tif"
+        jobs.append((srtm, temp_srtm, roi.bounds()))
 
-        f = io.StringIO()
-        with redirect_stdout(f):
-            geemap.ee_export_image(
-                srtm,
-                filename=str(temp_srtm),
-                region=roi.bounds(),
-                scale=scale,
-                file_per_band=False
-            )
+    # Todas as variáveis de relevo vêm da mesma imagem: um único download multibanda
+    terrain_vars = list(terrain_vars)
+    if include_terrain and terrain_vars:
+        if debug:
+            tqdm.write(f"⛰️  Incluindo Terrain: {', '.join(terrain_vars)}...")
+        terrain = ee.Terrain.products(ee.Image("USGS/SRTMGL1_003"))
+        temp_terrain = temp_dir / "terrain.tif"
+        jobs.append((terrain.select(terrain_vars), temp_terrain, roi.bounds()))
+
+    def _export(job):
+        image, temp_path, region = job
+        geemap.ee_export_image(
+            image,
+            filename=str(temp_path),
+            region=region,
+            scale=scale,
+            file_per_band=False
+        )
+        return temp_path
+
+    # O stdout é redirecionado uma única vez (redirect_stdout não é seguro entre threads),
+    # direto para o devnull, sem acumular a saída do geemap em memória
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        with ThreadPoolExecutor(max_workers=max(1, min(n_workers, len(jobs)))) as executor:
+            exported = list(tqdm(
+                executor.map(_export, jobs),
+                total=len(jobs),
+                desc="Exportando bandas"
+            ))
+    temp_paths = exported[:len(valid_years)]
+
+    # Todos os anos compartilham a mesma grade: o CRS e a janela de leitura (retângulo
+    # envolvente da ROI, em pixels) vêm do primeiro arquivo
+    with rasterio.open(temp_paths[0]) as first:
+        crs = first.crs
+        xmin, ymin, xmax, ymax = gdf.to_crs(crs).total_bounds
+        col0, row0 = ~first.transform * (xmin, ymax)
+        col1, row1 = ~first.transform * (xmax, ymin)
+        col0, row0 = max(0, int(np.floor(col0))), max(0, int(np.floor(row0)))
+        col1, row1 = min(first.width, int(np.ceil(col1))), min(first.height, int(np.ceil(row1)))
+        window = Window(col0, row0, col1 - col0, row1 - row0)
+        transform = first.window_transform(window)
+
+    # Lidas sem máscara (NaN forçaria float) direto num cubo uint8 pré-alocado (time, y, x),
+    # com 0 como nodata. O rasterio libera o GIL durante a leitura, então os anos são
+    # lidos em paralelo; o DataArray é construído uma única vez no final
+    cube = np.empty((len(temp_paths), window.height, window.width), dtype=np.uint8)
+
+    def _read_year(i):
+        with rasterio.open(temp_paths[i]) as src:
+            src.read(1, out=cube[i], window=window)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(n_workers, len(temp_paths)))) as executor:
+        list(executor.map(_read_year, range(len(temp_paths))))
+
+    # Coordenadas dos centros dos pixels da janela
+    grid_x = transform.c + (np.arange(window.width) + 0.5) * transform.a
+    grid_y = transform.f + (np.arange(window.height) + 0.5) * transform.e
+
+    times = pd.Index(pd.to_datetime([f"{year}-01-01" for year in valid_years]), name="time")
+    stacked = xr.DataArray(
+        cube,
+        dims=("time", "y", "x"),
+        coords={"time": times, "y": grid_y, "x": grid_x},
+        name="mapbiomas_class"
+    )
+
+    # O recorte pelo polígono da ROI é feito uma única vez sobre o cubo inteiro
+    stacked = stacked.rio.write_crs(crs).rio.write_transform(transform).rio.write_nodata(0)
+    stacked = stacked.rio.clip(gdf.geometry, gdf.crs, drop=True)
+    ds = stacked.to_dataset(name="mapbiomas_class")
 
+    if include_srtm:
         with rxr.open_rasterio(temp_srtm, masked=True, cache=False) as da_srtm:
             da_srtm = da_srtm.squeeze("band", drop=True)
+            # Recorte pelo retângulo envolvente antes do recorte pelo polígono: só a janela
+            # da ROI é lida do arquivo
+            da_srtm = da_srtm.rio.clip_box(*gdf.to_crs(da_srtm.rio.crs).total_bounds)
             da_srtm = da_srtm.rio.clip(gdf.geometry, gdf.crs, drop=True)
-            da_srtm_interp = da_srtm.interp_like(stacked)
+            # Reamostragem bilinear (GDAL) para a grade do MapBiomas
+            da_srtm_interp = da_srtm.rio.reproject_match(stacked, resampling=Resampling.bilinear)
             ds["srtm_elevation"] = da_srtm_interp
 
-    if include_terrain:
-        terrain = ee.Terrain.products(ee.Image("USGS/SRTMGL1_003"))
-        for var in terrain_vars:
-            if debug:
-                tqdm.write(f"⛰️  Incluindo Terrain: {var}...")
-            try:
-                terrain_img = terrain.select(var)
-                temp_terrain = temp_dir / f"terrain_{var}.tif"
-
-                f = io.StringIO()
-                with redirect_stdout(f):
-                    geemap.ee_export_image(
-                        terrain_img,
-                        filename=str(temp_terrain),
-                        region=roi.bounds(),
-                        scale=scale,
-                        file_per_band=False
-                    )
-
-                with rxr.open_rasterio(temp_terrain, masked=True, cache=False) as da_terrain:
-                    da_terrain = da_terrain.squeeze("band", drop=True)
-                    da_terrain = da_terrain.rio.clip(gdf.geometry, gdf.crs, drop=True)
-                    da_terrain_interp = da_terrain.interp_like(stacked)
-                    ds[var] = da_terrain_interp
-            except Exception as e:
-                tqdm.write(f"⚠️ Falha ao incluir {var}: {e}")
+    if include_terrain and terrain_vars:
+        try:
+            with rxr.open_rasterio(temp_terrain, masked=True, cache=False) as da_terrain:
+                da_terrain = da_terrain.rio.clip_box(*gdf.to_crs(da_terrain.rio.crs).total_bounds)
+                da_terrain = da_terrain.rio.clip(gdf.geometry, gdf.crs, drop=True)
+                da_terrain = da_terrain.rio.reproject_match(stacked, resampling=Resampling.bilinear)
+                for i, var in enumerate(terrain_vars):
+                    ds[var] = da_terrain.isel(band=i, drop=True)
+        except Exception as e:
+            tqdm.write(f"⚠️ Falha ao incluir {', '.join(terrain_vars)}: {e}")
 
     ds.attrs["title"] = "MapBiomas Collection 9" + (" + SRTM" if include_srtm else "")
     ds.attrs["created"] = str(datetime.datetime.now())
@@ -886,17 +1203,23 @@ def extract_mapbiomas(roi, years=range(1985, 2023), include_srtm=True,
     if debug:
         tqdm.write("✅ Dataset final criado com sucesso.")
 
-    # Tentativa segura com espera
-    for _ in range(5):
-        try:
-            shutil.rmtree(temp_dir)
-            if debug:
-                tqdm.write(f"🧹 Diretório temporário {temp_dir} removido.")
-            break
-        except PermissionError as e:
-            tqdm.write(f"⏳ Aguardando liberação do diretório ({e})...")
-            time.sleep(1)
-    else:
-        tqdm.write(f"⚠️ Não foi possível remover o diretório {temp_dir} após múltiplas tentativas.")
+    # Todos os arquivos já foram lidos para a memória e fechados: uma única remoção basta
+    shutil.rmtree(temp_dir, ignore_errors=True)
+    if debug:
+        tqdm.write(f"🧹 Diretório temporário {temp_dir} removido.")
+
+    # Gravação opcional em Zarr: o cubo em memória é liberado e o dataset retornado
+    # passa a ser lido do disco sob demanda
+    if output_zarr is not None:
+        chunk_sizes = {"time": 1, "y": 1024, "x": 1024}
+        encoding = {
+            var: {"chunks": tuple(min(chunk_sizes.get(dim, size), size)
+                                  for dim, size in zip(ds[var].dims, ds[var].shape))}
+            for var in ds.data_vars
+        }
+        ds.to_zarr(output_zarr, mode="w", encoding=encoding, consolidated=True)
+        ds = xr.open_zarr(output_zarr, chunks=None)
+        if debug:
+            tqdm.write(f"💾 Dataset gravado em {output_zarr}.")
 
     return ds
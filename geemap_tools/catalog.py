@@ -1,18 +1,23 @@
 # geemap_tools/catalog.py
 import ee
 import eemont
-import geopandas as gpd
+import numpy as np
 import pandas as pd
-from tqdm import tqdm
-import os
-import warnings
-from pathlib import Path
-from zipfile import ZipFile
-import tempfile
-from tempfile import TemporaryDirectory
-from .clouds import get_clear_sky_percentage
-
-def list_sat_images(collection_id, roi, max_imgs=500, compute_clear_sky=False, time_range=None):
+from functools import lru_cache
+from .clouds import _server_clear_pct
+
+
+@lru_cache(maxsize=128)
+def _roi_area(area_ser):
+    """
+    Área (m²) da ROI, memorizada pela serialização da expressão `roi.area(...)` (determinística):
+    repetir a consulta com a mesma ROI não faz nova chamada ao servidor.
+    """
+    return ee.deserializer.fromJSON(area_ser).getInfo()
+
+
+def list_sat_images(collection_id, roi, max_imgs=500, compute_clear_sky=False, time_range=None,
+                    min_clear_sky=None, use_metadata_cloud=False, clear_sky_scale=None):
     """
     Lista imagens de uma coleção Earth Engine com metadados úteis e interseção com uma ROI.
     
@@ -22,6 +27,12 @@ def list_sat_images(collection_id, roi, max_imgs=500, compute_clear_sky=False, t
         max_imgs (int): Máximo de imagens a processar (padrão: 500).
         compute_clear_sky (bool): Se True, calcula percentual de céu claro com base na máscara de nuvem.
         time_range (tuple): Par de strings com data inicial e final no formato 'YYYY-MM-DD'.
+        min_clear_sky (float): Se informado, descarta no servidor as imagens cuja cobertura de nuvens
+            nos metadados (CLOUD_COVER / CLOUDY_PIXEL_PERCENTAGE) exceda 100 - min_clear_sky, antes de qualquer cálculo por pixel.
+        use_metadata_cloud (bool): Se True, preenche 'clear_sky_%' como 100 - cobertura de nuvens dos metadados,
+            sem reduzir a máscara de nuvem (mais rápido; valor da cena inteira, não da ROI).
+        clear_sky_scale (float): Escala (m) do cálculo de céu claro. Se None, usa a resolução nativa
+            (30 m Landsat, 10 m Sentinel-2); uma escala de pré-visualização (ex: 100) é bem mais rápida.
     
     Retorno:
         pd.DataFrame: Tabela com metadados das imagens e percentual da ROI coberto.
@@ -38,6 +49,12 @@ def list_sat_images(collection_id, roi, max_imgs=500, compute_clear_sky=False, t
         max_imgs (int): Maximum number of images to process (default: 500).
         compute_clear_sky (bool): If True, computes clear sky percentage based on the cloud mask.
         time_range (tuple): Pair of strings with start and end date in the 'YYYY-MM-DD' format.
+        min_clear_sky (float): If given, drops server-side the images whose metadata cloud cover
+            (CLOUD_COVER / CLOUDY_PIXEL_PERCENTAGE) exceeds 100 - min_clear_sky, before any per-pixel computation.
+        use_metadata_cloud (bool): If True, fills 'clear_sky_%' as 100 - metadata cloud cover,
+            without reducing the cloud mask (faster; whole-scene value, not ROI-specific).
+        clear_sky_scale (float): Scale (m) of the clear sky computation. If None, uses the native resolution
+            (30 m Landsat, 10 m Sentinel-2); a preview scale (e.g. 100) is much faster.
     
     Returns:
         pd.DataFrame: Table with image metadata and percentage of ROI covered.
@@ -79,58 +96,69 @@ def list_sat_images(collection_id, roi, max_imgs=500, compute_clear_sky=False, t
         start_date, end_date = time_range
         collection = collection.filterDate(start_date, end_date)
 
-    roi_area = roi.area(ee.ErrorMargin(1)).getInfo()
-    ids = collection.aggregate_array('system:id').getInfo()
-    ids = ids[:max_imgs]
-
-    metadata_list = []
-
-    for img_id in tqdm(ids, desc="Coletando metadados"):
-        img = ee.Image(img_id)
-        props = img.getInfo().get('properties', {})
-
-        # Proporção da imagem que cobre a ROI
-        try:
-            geom = img.geometry()
-            inter = geom.intersection(roi, ee.ErrorMargin(1))
-            inter_area = inter.area(ee.ErrorMargin(1)).getInfo()
-            proportion = round((inter_area / roi_area) * 100, 1) if inter_area > 0 else 0
-        except:
-            proportion = 0
-
-        # Extrai campos conforme dicionário
-        satellite = props.get(meta['satellite'], 'unknown')
-        img_cloud_cover = props.get(meta['cloud'])
-        solar_elevation = props.get(meta['elevation'])
-        solar_azimuth = props.get(meta['azimuth'])
-
-        if meta.get('zenith_to_elevation') and solar_elevation is not None:
-            solar_elevation = 90 - solar_elevation
-
-        # Cálculo opcional de céu claro
-        clear_pct = None
-        if compute_clear_sky:
-            try:
-                clear_pct = get_clear_sky_percentage(img, roi)
-            except Exception as e:
-                print(f"[DEBUG] Erro ao calcular clear_sky para {img_id}: {e}")
-                clear_pct = None
-
-        # Arredondamento
-        metadata = {
-            'id': img_id,
-            'date': pd.to_datetime(props.get('system:time_start'), unit='ms'),
-            'satellite': satellite,
-            'img_cloud_cover': round(img_cloud_cover) if img_cloud_cover is not None else None,
-            'solar_elevation': round(solar_elevation) if solar_elevation is not None else None,
-            'solar_azimuth': round(solar_azimuth) if solar_azimuth is not None else None,
-            'proportion_roi_%': round(proportion, 1),
-            'clear_sky_%': round(clear_pct, 1) if clear_pct is not None else None,
+    # Pré-filtro barato pela propriedade de nuvens da cena: as imagens descartadas aqui
+    # nunca passam pela redução da máscara de nuvem
+    if min_clear_sky is not None:
+        collection = collection.filter(ee.Filter.lte(meta['cloud'], 100 - min_clear_sky))
+
+    # Margem de erro criada uma única vez e reaproveitada em todas as operações geométricas
+    error_margin = ee.ErrorMargin(1)
+    roi_area = _roi_area(roi.area(error_margin).serialize())
+
+    # Escala da redução de céu claro: nativa (30 m no Landsat, 10 m no Sentinel-2) se não informada
+    if clear_sky_scale is None:
+        clear_sky_scale = 30 if meta is SATELLITE_METADATA["LANDSAT"] else 10
+
+    # Metadados, área de interseção e (opcionalmente) céu claro calculados no servidor
+    # para todas as imagens, trazidos numa única tabela (computeFeatures)
+    def _to_feat(img):
+        # Se a imagem cobre a ROI inteira (caso comum), a interseção é a própria ROI e
+        # o teste contains() evita o cálculo da interseção de polígonos
+        footprint = img.geometry()
+        inter_area = ee.Algorithms.If(
+            footprint.contains(roi, error_margin),
+            roi_area,
+            footprint.intersection(roi, error_margin).area(error_margin)
+        )
+        props = {
+            'id': img.get('system:id'),
+            'system:time_start': img.get('system:time_start'),
+            meta['satellite']: img.get(meta['satellite']),
+            meta['cloud']: img.get(meta['cloud']),
+            meta['elevation']: img.get(meta['elevation']),
+            meta['azimuth']: img.get(meta['azimuth']),
+            'inter_area': inter_area
         }
-
-        metadata_list.append(metadata)
-
-    return pd.DataFrame(metadata_list)
-
-
-
+        if compute_clear_sky and not use_metadata_cloud:
+            props['clear_sky'] = _server_clear_pct(img, roi, clear_sky_scale)
+        return ee.Feature(None, props)
+
+    columns = ['id', 'system:time_start', meta['satellite'], meta['cloud'],
+               meta['elevation'], meta['azimuth'], 'inter_area', 'clear_sky']
+    table = ee.data.computeFeatures({
+        'expression': ee.FeatureCollection(collection.limit(max_imgs).map(_to_feat)),
+        'fileFormat': 'PANDAS_DATAFRAME'
+    }).reindex(columns=columns)
+
+    # Pós-processamento vetorizado: uma operação por coluna em vez de if/else por imagem
+    proportions = np.round(table['inter_area'].fillna(0).to_numpy(dtype=float) / roi_area * 100, 1)
+    img_cloud_cover = table[meta['cloud']].astype(float)
+    solar_elevation = table[meta['elevation']].astype(float)
+    if meta.get('zenith_to_elevation'):
+        solar_elevation = 90 - solar_elevation
+
+    if use_metadata_cloud:
+        clear_sky = 100 - img_cloud_cover
+    else:
+        clear_sky = table['clear_sky'].astype(float)
+
+    return pd.DataFrame({
+        'id': table['id'],
+        'date': pd.to_datetime(table['system:time_start'], unit='ms'),
+        'satellite': table[meta['satellite']].fillna('unknown'),
+        'img_cloud_cover': img_cloud_cover.round().astype('Int64'),
+        'solar_elevation': solar_elevation.round().astype('Int64'),
+        'solar_azimuth': table[meta['azimuth']].astype(float).round().astype('Int64'),
+        'proportion_roi_%': proportions,
+        'clear_sky_%': clear_sky.round(1),
+    })
@@ -1,12 +1,53 @@
 # geemap_tools/clouds.py
 import ee
+from functools import lru_cache
+
+# Escala (m) da redução de céu claro por prefixo do ID da coleção
+_CLEAR_SKY_SCALE_BY_PREFIX = {
+    'LANDSAT/': 30,
+    'COPERNICUS/S2': 10,
+}
+
+def _image_id(img):
+    """
+    Retorna o ID do asset quando a imagem foi criada diretamente com `ee.Image('<id>')`;
+    caso contrário retorna None.
+
+    ----
+    Returns the asset ID when the image was created directly with `ee.Image('<id>')`;
+    otherwise returns None.
+    """
+    func = getattr(img, 'func', None)
+    img_id = (getattr(img, 'args', None) or {}).get('id')
+    if func is not None and isinstance(img_id, str) and func.getSignature().get('name') == 'Image.load':
+        return img_id
+    return None
+
+@lru_cache(maxsize=4096)
+def _band_names_by_id(img_id):
+    return tuple(ee.Image(img_id).bandNames().getInfo())
+
+def _band_names(img):
+    """
+    Nomes das bandas da imagem, memorizados por ID do asset (uma única chamada getInfo()
+    por imagem). Imagens sem ID (derivadas) consultam o servidor a cada chamada.
+
+    ----
+    Image band names, memoized by asset ID (a single getInfo() call per image).
+    Images without an ID (derived images) query the server on every call.
+    """
+    img_id = _image_id(img)
+    if img_id is None:
+        return tuple(img.bandNames().getInfo())
+    return _band_names_by_id(img_id)
 
 def custom_mask_clouds(img, debug=False):
     """
     Aplica uma máscara de nuvens personalizada a uma imagem do Earth Engine.
     
     Suporta imagens com bandas QA_PIXEL (Landsat), SCL (Sentinel-2) ou MSK_CLDPRB (probabilidade de nuvem).
-    Para Sentinel-2, utiliza a banda SCL com fallback para MSK_CLDPRB caso a máscara esteja completamente vazia.
+    Para Sentinel-2, utiliza a banda SCL; se MSK_CLDPRB existir, um pixel é considerado claro quando SCL ou MSK_CLDPRB o classificam como claro.
+    A escolha da banda é feita no servidor, então a função pode ser aplicada com `ImageCollection.map`.
     
     Parâmetros:
         img (ee.Image): Imagem de entrada contendo bandas de qualidade relacionadas a nuvens.
@@ -19,7 +60,8 @@ def custom_mask_clouds(img, debug=False):
     Apply a custom cloud mask to an Earth Engine image.
     
     Supports images with QA_PIXEL (Landsat), SCL (Sentinel-2), or MSK_CLDPRB (cloud probability) bands.
-    For Sentinel-2, uses the SCL band with fallback to MSK_CLDPRB if the mask is completely empty.
+    For Sentinel-2, uses the SCL band; if MSK_CLDPRB is present, a pixel is clear when either SCL or MSK_CLDPRB marks it as clear.
+    The band is chosen server-side, so the function can be applied with `ImageCollection.map`.
     
     Args:
         img (ee.Image): Input image containing cloud-related quality bands.
@@ -29,56 +71,25 @@ def custom_mask_clouds(img, debug=False):
         ee.Image: Image with clouds masked (cloud pixels removed).
     """
 
-    bands = img.bandNames().getInfo()
-
-    if 'QA_PIXEL' in bands:  # Landsat
-        cloud_mask = img.select('QA_PIXEL').bitwiseAnd(1 << 3).eq(0)
-        return img.updateMask(cloud_mask)
-
-    elif 'SCL' in bands:  # Sentinel-2
-        scl = img.select('SCL')
-        cloud_mask = scl.remap([3, 8, 9, 10], [0]*4, defaultValue=1).eq(1)
-        masked = img.updateMask(cloud_mask)
-
-        try:
-            test_mask = masked.mask().reduce(ee.Reducer.sum()).reduceRegion(
-                reducer=ee.Reducer.sum(),
-                geometry=img.geometry(),
-                scale=20,
-                maxPixels=1e8
-            ).getInfo()
-            total = list(test_mask.values())[0]
-            if total == 0 and 'MSK_CLDPRB' in bands:
-                cloud_prob = img.select('MSK_CLDPRB')
-                clear_mask = cloud_prob.lt(50)
-                return img.updateMask(clear_mask)
-        except Exception as e:
-            if debug:
-                print(f"[DEBUG] Erro ao testar máscara SCL: {e}")
-
-        return masked
+    if debug and not {'QA_PIXEL', 'SCL', 'MSK_CLDPRB'} & set(_band_names(img)):
+        print("[DEBUG] Nenhuma banda de nuvem reconhecida.")
 
-    elif 'MSK_CLDPRB' in bands:
-        cloud_prob = img.select('MSK_CLDPRB')
-        clear_mask = cloud_prob.lt(50)
-        return img.updateMask(clear_mask)
+    # Banda de qualidade escolhida no servidor (ee.Algorithms.If): nenhum getInfo() é
+    # necessário e a função pode ser usada dentro de ImageCollection.map
+    return img.updateMask(_clear_sky_image(img))
 
-    else:
-        if debug:
-            print("[DEBUG] Nenhuma banda de nuvem reconhecida.")
-        return img
-
-def get_clear_sky_percentage(img, roi, debug=False):
+def get_clear_sky_percentage(img, roi, debug=False, best_effort=True):
     """
     Calcula a porcentagem de céu claro (sem nuvens) sobre uma ROI com base na máscara de nuvem da imagem.
     
-    Utiliza a função `custom_mask_clouds()` para aplicar a máscara apropriada à imagem.
+    A máscara é construída apenas com a banda de qualidade (QA_PIXEL, SCL ou MSK_CLDPRB), com as mesmas regras de `custom_mask_clouds()`.
     A porcentagem é obtida a partir da média da máscara binária (1 = claro, 0 = nublado) sobre a ROI.
     
     Parâmetros:
         img (ee.Image): Imagem do Earth Engine com bandas de máscara de nuvem.
         roi (ee.Geometry | ee.Feature | ee.FeatureCollection): Região de interesse.
         debug (bool, opcional): Se True, imprime mensagens de depuração. Padrão é False.
+        best_effort (bool, opcional): Se True, o servidor pode engrossar a escala em ROIs grandes em vez de falhar. Padrão é True.
     
     Retorno:
         float | None: Porcentagem de pixels com céu claro (0 a 100), ou None se falhar.
@@ -86,54 +97,102 @@ def get_clear_sky_percentage(img, roi, debug=False):
     ----
     Computes the percentage of clear sky (cloud-free) pixels over a ROI based on the image's cloud mask.
     
-    Uses the `custom_mask_clouds()` function to apply the appropriate mask to the image.
+    The mask is built from the quality band alone (QA_PIXEL, SCL or MSK_CLDPRB), using the same rules as `custom_mask_clouds()`.
     The percentage is calculated from the mean value of a binary mask (1 = clear, 0 = cloudy) over the ROI.
     
     Args:
         img (ee.Image): Earth Engine image with cloud mask bands.
         roi (ee.Geometry | ee.Feature | ee.FeatureCollection): Region of interest.
         debug (bool, optional): If True, prints debug messages. Default is False.
+        best_effort (bool, optional): If True, the server may coarsen the scale on large ROIs instead of failing. Default is True.
     
     Returns:
         float | None: Percentage of cloud-free pixels (0 to 100), or None if it fails.
     """
 
     try:
-        band_names = img.bandNames()
-        scale = 10  # padrão para Sentinel-2
-
-        if band_names.contains('QA_PIXEL').getInfo():
-            scale = 30  # Landsat
-        elif band_names.contains('SCL').getInfo():
-            scale = 10
-        elif band_names.contains('MSK_CLDPRB').getInfo():
-            scale = 20
-
-        # Aplica máscara personalizada
-        cloud_masked = custom_mask_clouds(img)
-
-        # Obtém a primeira banda da máscara
-        clear_mask = cloud_masked.mask().select(0)
-
-        # Reduz sobre a ROI
-        stats = clear_mask.reduceRegion(
-            reducer=ee.Reducer.mean(),
-            geometry=roi,
-            scale=scale,
-            maxPixels=1e9
-        ).getInfo()
-
-        if not stats:
+        # Escala pelo prefixo do ID (constante para toda a coleção); as bandas só são
+        # consultadas para imagens sem ID ou de coleções não listadas
+        img_id = _image_id(img)
+        scale = next((s for prefix, s in _CLEAR_SKY_SCALE_BY_PREFIX.items()
+                      if img_id is not None and img_id.startswith(prefix)), None)
+
+        if scale is None:
+            band_names = _band_names(img)
+            scale = 10  # padrão para Sentinel-2
+
+            if 'QA_PIXEL' in band_names:
+                scale = 30  # Landsat
+            elif 'SCL' in band_names:
+                scale = 10
+            elif 'MSK_CLDPRB' in band_names:
+                scale = 20
+
+        # Máscara binária feita só com a banda de qualidade e média sobre a ROI, encadeadas
+        # no servidor como ee.Number: um único escalar volta no getInfo()
+        clear_pct = _server_clear_pct(img, roi, scale, best_effort).getInfo()
+
+        if clear_pct is None:
             if debug:
-                print("[DEBUG] Redução retornou dicionário vazio.")
+                print("[DEBUG] Redução não retornou valor.")
             return None
 
-        # Pega o primeiro valor do dicionário (única banda)
-        clear_mean = list(stats.values())[0]
-
-        return round(clear_mean * 100, 1)
+        return round(clear_pct, 1)
 
     except Exception as e:
         if debug:
             print(f"[DEBUG] Erro em get_clear_sky_percentage: {e}")
         return None
+
+def _clear_sky_image(img):
+    """
+    Imagem binária de céu claro (1 = claro, 0 = nublado) construída apenas no servidor.
+
+    A banda de qualidade é escolhida com `ee.Algorithms.If`, sem nenhum `getInfo()`,
+    o que permite usar a função dentro de `ImageCollection.map`.
+
+    ----
+    Binary clear-sky image (1 = clear, 0 = cloudy) built entirely server-side.
+
+    The quality band is picked with `ee.Algorithms.If`, without any `getInfo()`,
+    so the function can be used inside `ImageCollection.map`.
+    """
+    band_names = img.bandNames()
+    has_prob = band_names.contains('MSK_CLDPRB')
+
+    # Expressões apenas descritas aqui; o servidor avalia só o ramo escolhido
+    qa_clear = img.select('QA_PIXEL').bitwiseAnd(1 << 3).eq(0)
+    scl_clear = img.select('SCL').remap([3, 8, 9, 10], [0]*4, defaultValue=1)
+    prob_clear = img.select('MSK_CLDPRB').lt(50)
+
+    return ee.Image(ee.Algorithms.If(
+        band_names.contains('QA_PIXEL'),  # Landsat
+        qa_clear,
+        ee.Algorithms.If(
+            band_names.contains('SCL'),  # Sentinel-2
+            ee.Algorithms.If(has_prob, scl_clear.Or(prob_clear), scl_clear),
+            ee.Algorithms.If(has_prob, prob_clear, ee.Image.constant(1))
+        )
+    )).rename('clear')
+
+def _server_clear_pct(img, roi, scale, best_effort=True):
+    """
+    Porcentagem de céu claro sobre a ROI como `ee.Number` (sem `getInfo()`).
+    Pixels fora da imagem contam como não claros, como em `get_clear_sky_percentage()`.
+
+    ----
+    Clear-sky percentage over the ROI as an `ee.Number` (no `getInfo()`).
+    Pixels outside the image count as not clear, as in `get_clear_sky_percentage()`.
+    """
+    # Pixels sem dados contam como não claros; as demais bandas da imagem não são carregadas
+    # bestEffort/tileScale: o servidor pode engrossar a escala ou subdividir os tiles
+    # em vez de falhar (ou demorar) em ROIs grandes
+    stats = _clear_sky_image(img).unmask(0).reduceRegion(
+        reducer=ee.Reducer.mean(),
+        geometry=roi,
+        scale=scale,
+        maxPixels=1e9,
+        bestEffort=best_effort,
+        tileScale=4
+    )
+    return ee.Number(stats.get('clear')).multiply(100)
@@ -1,16 +1,93 @@
 # geemap_tools/io.py
 import ee
-import eemont
 import geopandas as gpd
 import pandas as pd
-from tqdm import tqdm
 import os
-import warnings
+import json
 from pathlib import Path
-from zipfile import ZipFile
+from zipfile import ZipFile, ZIP_STORED
 import zipfile
+import shutil
 import tempfile
-from tempfile import TemporaryDirectory
+from functools import singledispatch
+
+# pyogrio (opcional) grava/lê sem o custo por feição do Fiona; sem ele, o geopandas
+# usa o motor padrão
+try:
+    import pyogrio
+    _GPD_ENGINE = 'pyogrio'
+except ImportError:
+    _GPD_ENGINE = None
+
+# O GDAL grava shapefiles direto em .shp.zip a partir da versão 3.1
+_SHP_ZIP_WRITE = _GPD_ENGINE == 'pyogrio' and pyogrio.__gdal_version__ >= (3, 1)
+
+# Leitura colunar em lotes Arrow quando pyogrio e pyarrow estão disponíveis
+_READ_KWARGS = {'engine': _GPD_ENGINE} if _GPD_ENGINE else {}
+if _GPD_ENGINE:
+    try:
+        import pyarrow  # noqa: F401
+        _READ_KWARGS['use_arrow'] = True
+    except ImportError:
+        pass
+
+def _features_to_gdf(features):
+    try:
+        return gpd.GeoDataFrame.from_features(features)
+    except Exception as e:
+        raise RuntimeError(f"Erro ao converter para GeoDataFrame: {e}")
+
+
+# Conversão da ROI em GeoDataFrame, escolhida pelo tipo do objeto (singledispatch)
+@singledispatch
+def _roi_gdf(roi, wrap_geometry):
+    raise TypeError(f"Tipo inválido: {type(roi)}. Esperado ee.Geometry, ee.Feature ou ee.FeatureCollection.")
+
+
+@_roi_gdf.register(ee.Geometry)
+def _(roi, wrap_geometry):
+    # Uma única chamada getInfo(): o tipo é verificado no GeoJSON retornado e a
+    # Feature é montada localmente
+    geom_info = roi.getInfo()
+    if geom_info.get('type') not in ['Polygon', 'MultiPolygon']:
+        raise ValueError("A geometria deve ser Polygon ou MultiPolygon.")
+    if not wrap_geometry:
+        raise ValueError("A geometria precisa ser embrulhada como Feature para exportação.")
+    return _features_to_gdf([{'type': 'Feature', 'geometry': geom_info, 'properties': {}}])
+
+
+@_roi_gdf.register(ee.Feature)
+def _(roi, wrap_geometry):
+    return _features_to_gdf([roi.getInfo()])
+
+
+@_roi_gdf.register(ee.FeatureCollection)
+def _(roi, wrap_geometry):
+    # Tabela paginada (computeFeatures) convertida direto em GeoDataFrame, sem o limite de
+    # payload do getInfo() e sem manter também o dicionário com todas as feições.
+    # Se o servidor recusar (coleção grande demais), o arquivo é gerado no servidor e lido
+    # direto da URL
+    try:
+        return ee.data.computeFeatures({
+            'expression': roi,
+            'fileFormat': 'GEOPANDAS_GEODATAFRAME'
+        })
+    except ee.EEException as e:
+        try:
+            return _download_fc_gdf(roi)
+        except Exception as e_download:
+            raise RuntimeError(f"Erro ao acessar FeatureCollection: {e}; {e_download}")
+    except Exception as e:
+        raise RuntimeError(f"Erro ao acessar FeatureCollection: {e}")
+
+
+def _download_fc_gdf(roi):
+    gdf = gpd.read_file(roi.getDownloadURL(filetype='geojson'), engine=_GPD_ENGINE)
+    # O GDAL transforma o id de cada feição (system:index) numa coluna 'id'; ela só é
+    # mantida se for uma propriedade de fato, como no caminho do computeFeatures
+    if 'id' in gdf.columns and 'id' not in roi.first().propertyNames().getInfo():
+        gdf = gdf.drop(columns='id')
+    return gdf
 
 
 def roi_to_file(roi, filename, format='geojson', wrap_geometry=True):
@@ -59,44 +136,48 @@ def roi_to_file(roi, filename, format='geojson', wrap_geometry=True):
     if output_dir:
         os.makedirs(output_dir, exist_ok=True)
 
-    if isinstance(roi, ee.Geometry):
-        if roi.type().getInfo() not in ['Polygon', 'MultiPolygon']:
-            raise ValueError("A geometria deve ser Polygon ou MultiPolygon.")
-        if wrap_geometry:
-            roi = ee.Feature(roi)
-        else:
-            raise ValueError("A geometria precisa ser embrulhada como Feature para exportação.")
-        features = [roi.getInfo()]
-    elif isinstance(roi, ee.Feature):
-        features = [roi.getInfo()]
-    elif isinstance(roi, ee.FeatureCollection):
-        try:
-            features = roi.getInfo().get('features', [])
-        except Exception as e:
-            raise RuntimeError(f"Erro ao acessar FeatureCollection com getInfo(): {e}")
-    else:
-        raise TypeError(f"Tipo inválido: {type(roi)}. Esperado ee.Geometry, ee.Feature ou ee.FeatureCollection.")
+    gdf = _roi_gdf(roi, wrap_geometry)
 
     try:
-        gdf = gpd.GeoDataFrame.from_features(features)
         gdf = gdf.set_crs("EPSG:4326")
     except Exception as e:
         raise RuntimeError(f"Erro ao converter para GeoDataFrame: {e}")
 
     if format == 'geojson':
         output_path = f"{filename}.geojson"
-        gdf.to_file(output_path, driver='GeoJSON')
+        # Os dados já estão em memória: serialização direta, sem abrir o driver GeoJSON do OGR
+        Path(output_path).write_text(
+            gdf.to_json(drop_id=True, ensure_ascii=False, default=str), encoding='utf-8'
+        )
     elif format == 'shp':
-        with tempfile.TemporaryDirectory() as tmpdir:
-            base_name = Path(filename).name
-            tmp_shp = os.path.join(tmpdir, base_name + ".shp")
-            gdf.to_file(tmp_shp)
-            zip_path = f"{filename}.zip"
-            with ZipFile(zip_path, 'w') as zipf:
-                for ext in ['.shp', '.shx', '.dbf', '.prj', '.cpg']:
-                    f = os.path.join(tmpdir, base_name + ext)
-                    if os.path.exists(f):
-                        zipf.write(f, arcname=os.path.basename(f))
+        zip_path = f"{filename}.zip"
+        if _SHP_ZIP_WRITE:
+            # O GDAL grava o shapefile já compactado (.shp.zip, entradas DEFLATE) numa só
+            # passada, sem arquivos temporários para reler
+            shp_zip_path = f"{filename}.shp.zip"
+            try:
+                gdf.to_file(shp_zip_path, driver='ESRI Shapefile', engine=_GPD_ENGINE)
+                os.replace(shp_zip_path, zip_path)
+            except Exception as e:
+                # Não deixa um .shp.zip parcial ao lado da saída
+                if os.path.exists(shp_zip_path):
+                    os.remove(shp_zip_path)
+                raise RuntimeError(f"Erro ao salvar o shapefile: {e}")
+        else:
+            with tempfile.TemporaryDirectory() as tmpdir:
+                base_name = Path(filename).name
+                tmp_shp = os.path.join(tmpdir, base_name + ".shp")
+                gdf.to_file(tmp_shp, engine=_GPD_ENGINE)
+                # Caminho alternativo (sem pyogrio ou GDAL antigo): arquivos apenas armazenados
+                # (ZIP_STORED, sem compressão) e copiados em blocos de 1 MiB
+                with ZipFile(zip_path, 'w', compression=ZIP_STORED) as zipf:
+                    for ext in ['.shp', '.shx', '.dbf', '.prj', '.cpg']:
+                        f = os.path.join(tmpdir, base_name + ext)
+                        if os.path.exists(f):
+                            large = os.path.getsize(f) >= zipfile.ZIP64_LIMIT
+                            with open(f, 'rb') as src, \
+                                    zipf.open(os.path.basename(f), 'w', force_zip64=large) as dst:
+                                shutil.copyfileobj(src, dst, 1 << 20)
         output_path = zip_path
     else:
         raise ValueError("Formato inválido. Use 'geojson' ou 'shp'.")
@@ -144,35 +225,46 @@ def file_to_roi(filepath):
         raise FileNotFoundError(f"Arquivo não encontrado: {filepath}")
 
     if filepath.endswith(".zip"):
-        with TemporaryDirectory() as tmpdir:
-            with ZipFile(filepath, 'r') as zip_ref:
-                zip_ref.extractall(tmpdir)
-            shp_files = [f for f in os.listdir(tmpdir) if f.endswith(".shp")]
-            if not shp_files:
-                raise ValueError("Nenhum .shp encontrado no .zip.")
-            filepath = os.path.join(tmpdir, shp_files[0])
-            gdf = gpd.read_file(filepath)
+        # O shapefile é lido de dentro do .zip pelo GDAL (/vsizip/), sem extrair para o disco
+        with ZipFile(filepath, 'r') as zip_ref:
+            shp_files = [f for f in zip_ref.namelist() if f.endswith(".shp")]
+        if not shp_files:
+            raise ValueError("Nenhum .shp encontrado no .zip.")
+        gdf = gpd.read_file(f"/vsizip/{os.path.abspath(filepath)}/{shp_files[0]}", **_READ_KWARGS)
     else:
         try:
-            gdf = gpd.read_file(filepath)
+            gdf = gpd.read_file(filepath, **_READ_KWARGS)
         except Exception as e:
             raise RuntimeError(f"Erro ao ler o arquivo com geopandas: {e}")
 
+    # Reprojeta só quando necessário (arquivos GeoJSON normalmente já estão em EPSG:4326)
     if gdf.crs is None:
         gdf.set_crs("EPSG:4326", inplace=True)
-    else:
+    elif gdf.crs.to_epsg() != 4326:
         gdf = gdf.to_crs("EPSG:4326")
 
+    # Toda a tabela serializada de uma vez como FeatureCollection GeoJSON (sem iterrows nem
+    # cópia de Series por linha). O cliente do Earth Engine ainda cria um ee.Feature por feição
+    # ao montar a coleção; o ganho é na conversão do lado do pandas
+    # Colunas de data não cabem no JSON: vão como milissegundos desde a época e voltam a
+    # ser ee.Date em cada feição, como no envio de um datetime direto ao Earth Engine
+    geom_col = gdf.geometry.name
+    date_cols = [col for col in gdf.columns
+                 if col != geom_col and pd.api.types.is_datetime64_any_dtype(gdf[col])]
+    if date_cols:
+        gdf = gdf.copy()
+        for col in date_cols:
+            gdf[col] = gdf[col].map(lambda t: None if pd.isna(t) else t.timestamp() * 1000)
+
     try:
-        features = []
-        for _, row in gdf.iterrows():
-            geom_geojson = row.geometry.__geo_interface__
-            props = row.drop(labels='geometry').to_dict()
-            ee_geom = ee.Geometry(geom_geojson)
-            ee_feat = ee.Feature(ee_geom, props)
-            features.append(ee_feat)
+        # drop_id: sem 'id' nas feições, o system:index não é sobrescrito pelo índice do
+        # GeoDataFrame (nem conflita com uma coluna 'system:index' do arquivo)
+        geojson = json.loads(gdf.to_json(drop_id=True))
+        for feat in geojson['features']:
+            props = feat['properties']
+            for col in date_cols:
+                if props.get(col) is not None:
+                    props[col] = ee.Date(props[col])
+        return ee.FeatureCollection(geojson)
     except Exception as e:
         raise RuntimeError(f"Erro ao converter para ee.Feature: {e}")
-
-    return ee.FeatureCollection(features)
-
@@ -3,11 +3,74 @@ import requests
 import warnings
 from io import BytesIO
 import urllib3
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+# Leitor de Excel em Rust (python-calamine, opcional); sem ele, o pandas usa o openpyxl
+try:
+    import python_calamine  # noqa: F401
+    _EXCEL_ENGINE = 'calamine'
+except ImportError:
+    _EXCEL_ENGINE = None
 
 # Suprime avisos de certificado não verificado da SIDRA
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
-def get_sidra_cultura(cod_mun, cod_cultura, debug=False):
+# Sessão HTTP do módulo: o pool de conexões com a SIDRA é reaproveitado entre as variáveis
+# e entre chamadas, com novas tentativas para falhas temporárias do servidor
+_SESSION = requests.Session()
+_SESSION.verify = False
+_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=8,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[502, 503, 504])
+))
+
+# Tempo máximo (s) de espera por resposta da SIDRA em cada requisição
+_SIDRA_TIMEOUT = 30
+
+# Variáveis da Tabela 5457
+_SIDRA_VARS = ('8331', '216', '214', '112')
+
+def _sidra_url(cod_mun, var, cod_cultura):
+    return (
+        f"https://sidra.ibge.gov.br/geratabela?format=xlsx&name=tabela5457.xlsx"
+        f"&terr=N&rank=-&query=t/5457/n6/{cod_mun}/v/{var}/p/all/c782/{cod_cultura}/l/c782%2Bt,,p%2Bv"
+    )
+
+def _read_sidra_excel(url):
+    try:
+        r = _SESSION.get(url, timeout=_SIDRA_TIMEOUT)
+        # Páginas de erro (HTML) não chegam ao leitor de Excel
+        r.raise_for_status()
+        # Só as colunas usadas (ano e valor) são decodificadas
+        df_raw = pd.read_excel(BytesIO(r.content), skiprows=4, header=None,
+                               usecols=[0, 2], engine=_EXCEL_ENGINE)
+    except Exception as e:
+        raise RuntimeError(f"Erro ao baixar ou ler o Excel da SIDRA: {e}")
+
+    if df_raw.empty or df_raw.shape[1] < 2:
+        raise ValueError("Arquivo retornado pela SIDRA parece inválido ou sem dados.")
+
+    return df_raw
+
+@lru_cache(maxsize=32)
+def _fetch_sidra_tables(cod_mun, cod_cultura):
+    """
+    Baixa e lê as quatro variáveis da Tabela 5457, em paralelo, pela sessão HTTP do módulo.
+    O resultado fica em memória para chamadas repetidas com o mesmo município e cultura;
+    erros não são memorizados. `_fetch_sidra_tables.cache_clear()` (ou `refresh=True` em
+    `get_sidra_cultura()`) descarta as tabelas guardadas.
+    """
+    with ThreadPoolExecutor(max_workers=len(_SIDRA_VARS)) as executor:
+        return tuple(executor.map(
+            lambda var: _read_sidra_excel(_sidra_url(cod_mun, var, cod_cultura)),
+            _SIDRA_VARS
+        ))
+
+def get_sidra_cultura(cod_mun, cod_cultura, debug=False, refresh=False):
     """
     Extrai dados da Tabela 5457 da SIDRA/IBGE sobre produção agrícola municipal.
     
@@ -15,6 +78,8 @@ def get_sidra_cultura(cod_mun, cod_cultura, debug=False):
         cod_mun (str): Código do município no IBGE (ex: '3169406' para Três Pontas-MG).
         cod_cultura (str): Código da cultura no IBGE (ex: '40139' para Café em grão).
         debug (bool): Se True, imprime informações de progresso e diagnóstico.
+        refresh (bool): Se True, descarta as tabelas já baixadas nesta sessão Python e
+            consulta a SIDRA novamente (ex: após a publicação de um novo ano).
     
     Retorno:
         pd.DataFrame: DataFrame com colunas:
@@ -31,6 +96,8 @@ def get_sidra_cultura(cod_mun, cod_cultura, debug=False):
         cod_mun (str): IBGE code of the municipality (e.g., '3169406' for Três Pontas-MG).
         cod_cultura (str): IBGE code of the crop (e.g., '40139' for Coffee beans).
         debug (bool): If True, prints progress and diagnostic information.
+        refresh (bool): If True, discards the tables already downloaded in this Python
+            session and queries SIDRA again (e.g., after a new year is published).
     
     Returns:
         pd.DataFrame: DataFrame with the following columns:
@@ -44,40 +111,28 @@ def get_sidra_cultura(cod_mun, cod_cultura, debug=False):
     if not cod_mun or not cod_cultura:
         raise ValueError("Você deve fornecer os códigos de município (cod_mun) e cultura (cod_cultura).")
 
-    # Variáveis da Tabela 5457
-    vars = ['8331', '216', '214', '112']
     vars_names = ['A.plantada', 'A.colhida', 'Q.colhida', 'Rendimento']
 
-    data = pd.DataFrame()
-
-    for ii, var in enumerate(vars):
-        url = (
-            f"https://sidra.ibge.gov.br/geratabela?format=xlsx&name=tabela5457.xlsx"
-            f"&terr=N&rank=-&query=t/5457/n6/{cod_mun}/v/{var}/p/all/c782/{cod_cultura}/l/c782%2Bt,,p%2Bv"
-        )
-
-        if debug:
-            print(f"[DEBUG] Baixando variável {vars_names[ii]} de {url}")
-
-        try:
-            r = requests.get(url, verify=False)
-            df_raw = pd.read_excel(BytesIO(r.content), skiprows=4, header=None)
-        except Exception as e:
-            raise RuntimeError(f"Erro ao baixar ou ler o Excel da SIDRA: {e}")
-
-        if df_raw.empty or df_raw.shape[1] < 3:
-            raise ValueError("Arquivo retornado pela SIDRA parece inválido ou sem dados.")
-
-        if ii == 0:
-            data['Ano'] = df_raw.iloc[:, 0]
+    if debug:
+        for var, name in zip(_SIDRA_VARS, vars_names):
+            print(f"[DEBUG] Variável {name}: {_sidra_url(cod_mun, var, cod_cultura)}")
 
-        data[vars_names[ii]] = df_raw.iloc[:, 2]
+    # Tabelas já baixadas nesta sessão Python são reaproveitadas da memória
+    if refresh:
+        _fetch_sidra_tables.cache_clear()
+    raw_tables = _fetch_sidra_tables(str(cod_mun), str(cod_cultura))
 
-    # Limpa última linha se for rodapé
-    data = data.iloc[:-1, :]
+    # Colunas reunidas num dicionário e DataFrame criado de uma só vez, alinhado às linhas
+    # da primeira variável e sem a última linha (rodapé)
+    cols = {'Ano': raw_tables[0].iloc[:, 0]}
+    for name, df_raw in zip(vars_names, raw_tables):
+        cols[name] = df_raw.iloc[:, 1]
 
     # Conversões e formatações
-    data = data.apply(pd.to_numeric, errors='coerce')
+    data = pd.DataFrame(
+        {name: pd.to_numeric(col, errors='coerce') for name, col in cols.items()},
+        index=raw_tables[0].index[:-1]
+    )
     data["Ano"] = pd.to_datetime(data["Ano"], format="%Y")
     data = data.set_index("Ano")
 
@@ -105,3 +160,49 @@ def get_sidra_cultura(cod_mun, cod_cultura, debug=False):
         print(f"[DEBUG] Unidades: {data.attrs}")
 
     return data
+
+def get_sidra_cultura_batch(pairs, n_workers=2, debug=False, refresh=False):
+    """
+    Extrai dados da Tabela 5457 para vários pares (município, cultura) em paralelo.
+    
+    Cada par é processado por `get_sidra_cultura()`; como o trabalho é dominado pela rede,
+    os pares são distribuídos entre threads que compartilham a sessão HTTP do módulo.
+    
+    Parâmetros:
+        pairs (iterable): Pares (cod_mun, cod_cultura), ex: [('3169406', '40139'), ...].
+        n_workers (int): Número de pares processados simultaneamente (padrão: 2;
+            cada par já baixa suas quatro variáveis em paralelo).
+        debug (bool): Se True, imprime informações de progresso e diagnóstico.
+        refresh (bool): Se True, descarta as tabelas já baixadas antes de consultar os pares.
+    
+    Retorno:
+        list[pd.DataFrame]: Um DataFrame por par, na mesma ordem de `pairs`.
+    
+    ----
+    Extracts Table 5457 data for several (municipality, crop) pairs in parallel.
+    
+    Each pair is handled by `get_sidra_cultura()`; since the work is network-bound,
+    pairs are spread across threads that share the module's HTTP session.
+    
+    Args:
+        pairs (iterable): (cod_mun, cod_cultura) pairs, e.g. [('3169406', '40139'), ...].
+        n_workers (int): Number of pairs processed concurrently (default: 2;
+            each pair already downloads its four variables in parallel).
+        debug (bool): If True, prints progress and diagnostic information.
+        refresh (bool): If True, discards the already downloaded tables before querying the pairs.
+    
+    Returns:
+        list[pd.DataFrame]: One DataFrame per pair, in the same order as `pairs`.
+    """
+    pairs = list(pairs)
+    if not pairs:
+        return []
+    # Limpeza única antes das threads, para que um par não descarte o que outro acabou de baixar
+    if refresh:
+        _fetch_sidra_tables.cache_clear()
+
+    with ThreadPoolExecutor(max_workers=max(1, min(n_workers, len(pairs)))) as executor:
+        return list(executor.map(
+            lambda pair: get_sidra_cultura(pair[0], pair[1], debug=debug),
+            pairs
+        ))
@@ -14,7 +14,7 @@ Este script é destinado apenas para fins de manutenção e documentação do pr
 Ele **não é incluído na instalação via pip**.
 """
 
-import re
+import ast
 import sys
 from pathlib import Path
 
@@ -36,22 +36,27 @@ Each function is documented using bilingual docstrings (Portuguese and English)
 
 def extract_docstrings(file_path):
     """
-    Extrai docstrings de funções públicas com aspas triplas em um arquivo Python.
+    Extrai docstrings das funções públicas de nível de módulo de um arquivo Python.
     Retorna uma lista de tuplas: (nome, argumentos, docstring limpa).
-    """
-    with open(file_path, encoding="utf-8") as f:
-        content = f.read()
 
-    # Expressão regular para encontrar funções com docstrings entre aspas triplas
-    pattern = r"def (\w+)\((.*?)\):\s+\"\"\"(.*?)\"\"\""
-    matches = re.findall(pattern, content, re.DOTALL)
+    O arquivo é analisado uma única vez com `ast`, o que também cobre docstrings
+    com aspas simples triplas e assinaturas em várias linhas.
+    """
+    tree = ast.parse(Path(file_path).read_text(encoding="utf-8"))
 
     docs = []
-    for name, args, doc in matches:
-        if name.startswith("_"):
+    for node in tree.body:
+        if not isinstance(node, ast.FunctionDef) or node.name.startswith("_"):
             continue  # ignora funções privadas
+        # Docstring lida direto do primeiro nó do corpo (a limpeza é feita abaixo)
+        first = node.body[0] if node.body else None
+        doc = (first.value.value
+               if isinstance(first, ast.Expr) and isinstance(first.value, ast.Constant)
+               and isinstance(first.value.value, str) else None)
+        if not doc:
+            continue
         clean_doc = "\n".join(line.strip() for line in doc.strip().splitlines())
-        docs.append((name, args, clean_doc))
+        docs.append((node.name, ast.unparse(node.args), clean_doc))
 
     return docs
 
@@ -19,7 +19,7 @@ setup(
     package_data={"geemap_tools": ["*.py"]},
     python_requires=">=3.9",
     install_requires=[
-        "earthengine-api>=0.1",
+        "earthengine-api>=1.0",
         "eemont>=0.3.5",
         "pyproj>=3.0",
         "pandas>=1.2",